@@ -1,7 +1,9 @@
-from sphinx.application import Sphinx
+from __future__ import annotations
 
-from .vb_autodoc import setup as setup_autodoc
-from .vb_domain import setup as setup_domain
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
 
 __version__ = '0.8.1'
 
@@ -9,6 +11,11 @@ __version__ = '0.8.1'
 def setup(app: Sphinx):
     '''Set up extension
     '''
+    # Import features here so that importing this package (e.g. utils from
+    # conf.py) doesn't load Sphinx modules.
+    from .vb_autodoc import setup as setup_autodoc
+    from .vb_domain import setup as setup_domain
+
     setup_autodoc(app)
     setup_domain(app)
 
@@ -0,0 +1,158 @@
+'''Command line interface to generate autodoc pages without sphinx-build.
+
+> python -m sphinx_vb_domain docs/source
+> python -m sphinx_vb_domain docs/source --check
+> python -m sphinx_vb_domain docs/source -p ../../macros modules Modules
+'''
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+
+from .vb_autodoc import generate_rst_contents, write_rst_files
+
+# Config values used by autodoc, with the same defaults as `setup()` of
+# vb_autodoc and vb_domain.
+CONFIG_DEFAULTS = {
+    'vb_autodoc_paths': [],
+    'vb_autodoc_module_labels': False,
+    'vb_encode_invalid_labels': True,
+    'vb_add_docname_to_labels': False,
+    'vb_docname_label_delimiter': '-',
+}
+
+
+def load_config(confdir: Path | None, overrides: dict[str, str],
+                tags: list[str] | None = None) -> SimpleNamespace:
+    '''Load vb_* config values from conf.py in `confdir`.
+
+    conf.py is executed in `confdir` as sphinx-build does, but the Sphinx
+    application is not created. If there is no conf.py, defaults are used.
+
+    Parameters
+    ----------
+    confdir : Path or None
+        Directory containing conf.py. None not to read conf.py.
+    overrides : dict
+        Values given by -D option, which are converted like sphinx-build.
+    tags : list of str, optional
+        Tags given by -t option, available as `tags` in conf.py.
+    '''
+    namespace = {}
+    conf_file = confdir / 'conf.py' if confdir else None
+    if conf_file and conf_file.is_file():
+        from sphinx.util.tags import Tags
+
+        namespace['__file__'] = str(conf_file)
+        namespace['tags'] = Tags(tags)
+        cwd = os.getcwd()
+        os.chdir(confdir)
+        try:
+            code = compile(conf_file.read_bytes(), str(conf_file), 'exec')
+            exec(code, namespace)
+        finally:
+            os.chdir(cwd)
+
+    config = SimpleNamespace(**CONFIG_DEFAULTS)
+    for name in CONFIG_DEFAULTS:
+        if name in namespace:
+            setattr(config, name, namespace[name])
+
+    for name, value in overrides.items():
+        if name not in CONFIG_DEFAULTS:
+            raise ValueError(f'Unknown config value: {name}')
+        default = CONFIG_DEFAULTS[name]
+        if isinstance(default, bool):
+            value = value not in ('0', '', 'False', 'false')
+        elif not isinstance(default, str):
+            raise ValueError(f'{name} cannot be overridden by -D.')
+        setattr(config, name, value)
+
+    return config
+
+
+def parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m sphinx_vb_domain',
+        description='Generate reST files from document comments in VB '
+                    'source code, as sphinx-build does with vb_autodoc=1.')
+    parser.add_argument(
+        'sourcedir', type=Path,
+        help='Sphinx source directory where reST files are generated.')
+    parser.add_argument(
+        '-c', dest='confdir', type=Path,
+        help='Directory containing conf.py (default: sourcedir).')
+    parser.add_argument(
+        '-C', '--isolated', action='store_true',
+        help='Do not read conf.py.')
+    parser.add_argument(
+        '-p', '--path', dest='paths', action='append', nargs=3,
+        metavar=('SRC', 'RST', 'TITLE'),
+        help='Use this instead of vb_autodoc_paths in conf.py. '
+             'Can be given multiple times.')
+    parser.add_argument(
+        '-t', dest='tags', action='append', default=[], metavar='TAG',
+        help='Define tag, which conf.py can check with tags.has().')
+    parser.add_argument(
+        '-D', dest='overrides', action='append', default=[],
+        metavar='setting=value', help='Override a setting in conf.py.')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='Number of worker processes to render VB modules (default: 1).')
+    parser.add_argument(
+        '--check', action='store_true',
+        help='Do not write files, but exit with 1 if any file is outdated.')
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    srcdir = args.sourcedir.resolve()
+    confdir = (args.confdir or args.sourcedir).resolve()
+
+    overrides = {}
+    for override in args.overrides:
+        name, sep, value = override.partition('=')
+        if not sep:
+            print(f'Invalid -D option: {override}', file=sys.stderr)
+            return 2
+        overrides[name] = value
+
+    try:
+        config = load_config(
+            None if args.isolated else confdir, overrides, args.tags)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if args.paths:
+        config.vb_autodoc_paths = [tuple(path) for path in args.paths]
+
+    if args.jobs > 1:
+        with ProcessPoolExecutor(args.jobs) as executor:
+            rst_files = generate_rst_contents(
+                config, confdir, srcdir, executor)
+    else:
+        rst_files = generate_rst_contents(config, confdir, srcdir)
+
+    if args.check:
+        outdated = []
+        for dest_file, rst_content in rst_files.items():
+            try:
+                if dest_file.read_bytes() == rst_content.encode('utf-8'):
+                    continue
+            except FileNotFoundError:
+                pass
+            outdated.append(dest_file)
+        for dest_file in outdated:
+            print(f'outdated: {dest_file}')
+        return 1 if outdated else 0
+
+    written = write_rst_files(rst_files, srcdir)
+    for dest_file in written:
+        print(f'written: {dest_file}')
+    print(f'{len(written)} written, {len(rst_files) - len(written)} unchanged')
+    return 0
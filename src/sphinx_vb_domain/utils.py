@@ -1,12 +1,22 @@
-import hashlib
+from __future__ import annotations
+
+import os
 import re
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
 
-from docutils.nodes import make_id
+# Modules used only in some functions are imported in them, so that
+# importing utils from conf.py stays cheap.
 
 
 def to_safe_label(name: str, encode_: bool) -> str:
     '''Generate a valid label by encoding invalid characters with md5.'''
+    import hashlib
+
+    from docutils.nodes import make_id
+
     invalid_symbols = re.compile(r'[!-/:-@\[-`{-~]')
     target_ptn = re.compile(r'[a-zA-Z0-9_\-]+')
 
@@ -33,6 +43,16 @@ def to_safe_label(name: str, encode_: bool) -> str:
     return '.'.join(target_parts)
 
 
+def normalize_width(text: str) -> str:
+    '''Normalize full-width/half-width characters in NFKC.
+
+    e.g. 'ﾓｼﾞｭｰﾙ１.関数Ａ' -> 'モジュール1.関数A'
+    '''
+    from unicodedata import normalize
+
+    return normalize('NFKC', text)
+
+
 def notes_from_template(
     template_file: str, encode_keys: bool = True, templates_dir: str = "_templates"
 ) -> dict:
@@ -74,12 +94,20 @@ def notes_from_template(
     current_value = []
     previous_line = ""
 
+    def is_underline(line: str) -> bool:
+        return bool(line.strip()) and all(c in "-=~^" for c in line.strip())
+
     for line in rst_content.splitlines():
         # Detect headings (e.g., lines followed by "----" or "~~~~")
-        if line.strip() and all(c in "-=~^" for c in line.strip()):
+        # A line of "----" after an empty line is a transition, not heading.
+        if previous_line.strip() and is_underline(line):
             # Save the current key-value pair
             if current_key and current_value:
-                notes[current_key] = "\n".join(current_value[:-1]).strip()
+                # Drop the title, and its overline if any.
+                value = current_value[:-1]
+                if value and is_underline(value[-1]):
+                    value.pop()
+                notes[current_key] = "\n".join(value).strip()
                 current_value = []
 
             # Update the current key (use the previous line as the key)
@@ -96,3 +124,121 @@ def notes_from_template(
         notes[current_key] = "\n".join(current_value).strip()
 
     return notes
+
+
+@contextmanager
+def file_lock(lock_file: Path, timeout: float = 60.0) -> Iterator[None]:
+    '''Hold an exclusive lock on `lock_file` across processes.
+
+    The lock file itself is left in place, because removing it would let
+    another process lock a different inode while the first still holds it.
+
+    Parameters
+    ----------
+    lock_file : Path
+        Path to the lock file. It is created if it does not exist.
+    timeout : float, optional
+        Seconds to wait for the lock before raising TimeoutError.
+    '''
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.name == 'nt':
+            import msvcrt
+
+            def try_lock():
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+            def unlock():
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            def try_lock():
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+            def unlock():
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                try_lock()
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f'Could not lock {lock_file}')
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            unlock()
+    finally:
+        os.close(fd)
+
+
+def lock_file_for(directory: str | Path) -> Path:
+    '''Path to lock file for `directory`, in the temporary directory.
+
+    The path is derived from the resolved `directory`, so that every
+    process writing into the same directory uses the same lock file
+    without leaving it in the directory.
+    '''
+    import hashlib
+    import tempfile
+
+    key = str(Path(directory).resolve()).encode('utf-8')
+    digest = hashlib.sha1(key).hexdigest()[:16]
+    return Path(tempfile.gettempdir()) / f'sphinx-vb-domain-{digest}.lock'
+
+
+def write_if_changed(dest_file: Path, content: str) -> bool:
+    '''Write `content` to `dest_file` atomically, unless it is unchanged.
+
+    The content is written to a temporary file in the same directory and
+    then moved over `dest_file` with `os.replace`, so readers never see a
+    truncated file. The parent directory must already exist.
+
+    Parameters
+    ----------
+    dest_file : Path
+        Path to the file to be written.
+    content : str
+        Text to be written (encoded in UTF-8).
+
+    Returns
+    -------
+    written : bool
+        False if `dest_file` already had the same bytes.
+    '''
+    import tempfile
+
+    data = content.encode('utf-8')
+    try:
+        if dest_file.read_bytes() == data:
+            return False
+        mode = dest_file.stat().st_mode & 0o777
+    except FileNotFoundError:
+        # New file gets the permissions open(..., 'w') would give.
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    fd, tmp_name = tempfile.mkstemp(
+        dir=dest_file.parent, prefix=f'.{dest_file.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp() creates the file as 0o600.
+        os.chmod(tmp_name, mode)
+        os.replace(tmp_name, dest_file)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
+    return True
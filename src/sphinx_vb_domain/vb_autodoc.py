@@ -1,15 +1,19 @@
+from __future__ import annotations
+
+import mmap
 import os
 import re
-import xml.etree.ElementTree as ET
 from collections import namedtuple
-from io import StringIO
+from itertools import chain
 from pathlib import Path
-from typing import Iterator
-from unicodedata import east_asian_width
+from typing import TYPE_CHECKING, Any, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
 
-from sphinx.application import Sphinx
+    from sphinx.application import Sphinx
 
-from .utils import to_safe_label
+from .utils import file_lock, lock_file_for, to_safe_label, write_if_changed
 
 # For config 'vb_autodoc_paths'. See `setup()` below.
 AutodocPath = namedtuple('AutodocPath', ['src', 'rst', 'title', 'notes'])
@@ -18,24 +22,130 @@ AutodocPath = namedtuple('AutodocPath', ['src', 'rst', 'title', 'notes'])
 sig_ptn = re.compile(
     r'((Public|Private|Friend|Protected)\s+)?(Function|Sub)\s+([^\(\s]+)')
 
+# Files of this size or larger are scanned by `scan_lines()`.
+MMAP_THRESHOLD = 1024 * 1024
+
+# Regex pattern for heading in notes: title and underline, or overline,
+# title and optional underline (docutils rejects the page if it's missing).
+# Any ASCII punctuation can be used for the lines in reST. Following lines
+# of underline characters are also taken as underline.
+_adornment = r'[!-/:-@\[-`{-~]+[ \t]*'
+_title = rf'[ \t]*(?!{_adornment}(?:\n|\Z))(\S[^\n]*)'
+heading_ptn = re.compile(
+    rf'^(?:{_adornment}\n{_title}(?:\n{_adornment})*'
+    rf'|{_title}(?:\n{_adornment})+)(?:\n|\Z)',
+    re.MULTILINE)
+
+# Regex patterns for tag and attribute in `parse_xml_tolerantly()`.
+# A name is not followed or preceded by a name character, so that a long
+# name is not matched again from every position in it (quadratic time).
+xml_tag_ptn = re.compile(
+    r'<(/?)([A-Za-z_][\w.\-]*)((?:[^<>\w.\-][^<>]*)?)>')
+xml_attr_ptn = re.compile(
+    r'(?<![\w.\-])([\w.\-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+# Any line of doc comment or function signature contains one of these.
+scan_tokens = (b"'''", b'Function', b'Sub')
+
+
+def parse_xml_tolerantly(xml_string: str) -> list[tuple[str, str, str]]:
+    '''Parse top-level elements of malformed document comment (xml).
+
+    Stray '&' and '<', unclosed and mismatched tags are tolerated. Text of
+    an element is taken up to its first child element, as ElementTree does.
+    This runs in linear time of the length of `xml_string`.
+
+    Returns
+    -------
+    elements : list of (str, str, str)
+        Tuples of tag, 'name' attribute and text per top-level element.
+    '''
+    from html import unescape
+
+    elements = []
+    # [tag, name, text start, text end] of current top-level element.
+    current = None
+    depth = 0
+
+    for match in xml_tag_ptn.finditer(xml_string):
+        closing, tag, attrs = match.groups()
+        self_closing = attrs.endswith('/')
+
+        if closing:
+            if not current:
+                continue  # Stray closing tag.
+            if tag == current[0] or depth == 1:
+                if current[3] is None:
+                    current[3] = match.start()
+                elements.append(current)
+                current = None
+                depth = 0
+            else:
+                depth -= 1
+            continue
+
+        if current:
+            # Child element: text of current element ends here.
+            if current[3] is None:
+                current[3] = match.start()
+            if not self_closing:
+                depth += 1
+            continue
+
+        name = ''
+        for attr_match in xml_attr_ptn.finditer(attrs):
+            if attr_match.group(1) == 'name':
+                name = unescape(attr_match.group(2) or attr_match.group(3))
+                break
+        if self_closing:
+            elements.append([tag, name, 0, 0])
+        else:
+            current = [tag, name, match.end(), None]
+            depth = 1
+
+    # Unclosed element lasts until the end.
+    if current:
+        elements.append(current)
+
+    return [(tag, name, unescape(xml_string[start:end]))
+            for tag, name, start, end in elements]
+
 
 def xml_to_dict(xml_string) -> dict[str, str]:
     '''Convert document comment (xml) to dict.
+
+    Malformed xml is parsed by `parse_xml_tolerantly()`.
     '''
-    root = ET.fromstring(f'<root>{xml_string}</root>')
+    # Imported here not to load it unless vb_autodoc is enabled.
+    import xml.etree.ElementTree as ET
+
+    try:
+        root = ET.fromstring(f'<root>{xml_string}</root>')
+        elements = [(child.tag, child.get('name', ''), child.text or '')
+                    for child in root]
+    except ET.ParseError:
+        elements = parse_xml_tolerantly(xml_string)
+
     result = {}
-    for child in root:
-        if child.tag == 'remarks' and 'remarks' in result:
-            result['remarks'] += '\n' + child.text
+    for tag, name, text in elements:
+        if tag == 'remarks' and 'remarks' in result:
+            result['remarks'] += '\n' + text
+        elif name:
+            result[f'{tag} {name}'] = text
         else:
-            name = child.get('name', '')
-            if name:
-                result[f'{child.tag} {name}'] = child.text
-            else:
-                result[child.tag] = child.text
+            result[tag] = text
     return result
 
 
+def field_body(text: str) -> str:
+    '''Format text as body of field in function directive.
+
+    Continuation lines are indented so that they stay in the field.
+    '''
+    lines = [line.strip() for line in text.strip().split('\n')]
+    return '\n      '.join(lines)
+
+
 class DocComment:
     '''Object containing doc comment (xml) and/or func signature.
     '''
@@ -46,7 +156,8 @@ class DocComment:
     def get_param_type(self, param_name: str):
         '''Get paramter type from 'param As xx' part of signature.
         '''
-        re_ptn = re.compile(param_name + r'\s+As\s+(\w+)', re.IGNORECASE)
+        re_ptn = re.compile(
+            re.escape(param_name) + r'\s+As\s+(\w+)', re.IGNORECASE)
         match = re_ptn.search(self.sig)
         if match and match.lastindex > 0:
             return match.group(1)
@@ -77,7 +188,7 @@ class DocComment:
 
         xml_data = xml_to_dict(self.xml)
 
-        if 'summary' in xml_data:
+        if xml_data.get('summary', '').strip():
             summary_lines = xml_data['summary'].strip().split('\n')
             for line in summary_lines:
                 content += f'{indent}{line.strip()}\n'
@@ -87,8 +198,11 @@ class DocComment:
 
         for key in xml_data:
             if key.split()[0] in ('param', 'parameter', 'arg', 'argument'):
+                # Skip param without name.
+                if len(key.split()) < 2:
+                    continue
                 param_name = key.split()[1]
-                content += f'{indent}:{key}: {xml_data[key]}\n'
+                content += f'{indent}:{key}: {field_body(xml_data[key])}\n'
 
                 param_type = self.get_param_type(param_name)
                 if param_type:
@@ -96,21 +210,21 @@ class DocComment:
                 continue
 
             if key in ('returns', 'return'):
-                content += f'{indent}:{key}: {xml_data[key]}\n'
+                content += f'{indent}:{key}: {field_body(xml_data[key])}\n'
                 return_type = self.get_return_type()
                 if return_type:
                     content += f'{indent}:rtype: {return_type}\n'
                 continue
 
             if key == 'rtype':
-                content += f'{indent}:{key}: {xml_data[key]}\n'
+                content += f'{indent}:{key}: {field_body(xml_data[key])}\n'
                 continue
 
         has_field_list = len(content) > content_length
         if has_field_list:
             content += '\n'
 
-        if 'remarks' in xml_data:
+        if xml_data.get('remarks', '').strip():
             remark_lines = xml_data['remarks'].strip().split('\n')
             for line in remark_lines:
                 content += f'{indent}{line}\n'
@@ -123,14 +237,14 @@ class DocComment:
         content = ''
         xml_data = xml_to_dict(self.xml)
 
-        if 'summary' in xml_data:
+        if xml_data.get('summary', '').strip():
             summary_lines = xml_data['summary'].strip().split('\n')
             content += '.. line-block::\n\n'
             for line in summary_lines:
                 content += f'{indent}{line}\n'
             content += '\n'
 
-        if 'remarks' in xml_data:
+        if xml_data.get('remarks', '').strip():
             remark_lines = xml_data['remarks'].strip().split('\n')
             content += '.. line-block::\n\n'
             for line in remark_lines:
@@ -156,16 +270,13 @@ class DocComment:
         return ''
 
 
-def extract_doccomments(f: StringIO) -> Iterator[DocComment]:
-    '''Generator of Document Comments from a text stream
+def extract_doccomments(f: Iterable[str]) -> Iterator[DocComment]:
+    '''Generator of Document Comments from a text stream (or lines)
     '''
     xml = ''
-    eof = False
 
-    while not eof:
-        line = f.readline()
-        if not line:
-            eof = True
+    # Empty line at the end to yield document comment kept at EOF.
+    for line in chain(f, ['']):
         line = line.strip()
 
         # Extract document comment (maybe empty) and function signature.
@@ -187,7 +298,68 @@ def extract_doccomments(f: StringIO) -> Iterator[DocComment]:
             xml = ''
 
 
+def scan_lines(mm: mmap.mmap) -> Iterator[str]:
+    '''Generator of lines which may be doc comment or function signature.
+
+    Searches a memory-mapped UTF-8 file at the byte level, and decodes only
+    the lines containing any of `scan_tokens`. Skipped lines are replaced
+    by one empty line, so `extract_doccomments()` gives the same result as
+    reading all the lines. LF, CRLF and lone CR are taken as newline, as
+    in text mode.
+    '''
+    size = len(mm)
+    # Next position of each token.
+    token_pos = {token: mm.find(token) for token in scan_tokens}
+    pos = 0
+    while True:
+        found = [p for p in token_pos.values() if p >= 0]
+        if not found:
+            return
+        match_start = min(found)
+
+        line_start = mm.rfind(b'\n', pos, match_start) + 1 or pos
+        lf_pos = mm.find(b'\n', match_start)
+        line_end = size if lf_pos < 0 else lf_pos + 1
+
+        # Lone CR is searched only within the line, not to scan the whole
+        # file again. CR just before LF is part of CRLF.
+        cr_pos = mm.rfind(b'\r', line_start, match_start)
+        if cr_pos >= 0:
+            line_start = cr_pos + 1
+        cr_end = size if lf_pos < 0 else lf_pos - 1
+        cr_pos = mm.find(b'\r', match_start, cr_end)
+        if cr_pos >= 0:
+            line_end = cr_pos + 1
+
+        if line_start > pos:
+            yield ''
+        yield mm[line_start:line_end].decode('utf-8')
+        pos = line_end
+
+        for token, p in token_pos.items():
+            if 0 <= p < pos:
+                token_pos[token] = mm.find(token, pos)
+
+
+def read_doccomments(src_file: Path) -> Iterator[DocComment]:
+    '''Generator of Document Comments from a VB module source file
+
+    Large files are memory-mapped and scanned by `scan_lines()`, so that
+    lines without doc comment (e.g. lookup tables) are not decoded.
+    '''
+    if os.path.getsize(src_file) >= MMAP_THRESHOLD:
+        with open(src_file, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from extract_doccomments(scan_lines(mm))
+            return
+
+    with open(src_file, 'r', encoding='utf-8') as f:
+        yield from extract_doccomments(f)
+
+
 def headline_len(title: str) -> int:
+    from unicodedata import east_asian_width
+
     def char_width(char: str) -> int:
         return 2 if east_asian_width(char) in ('F', 'W') else 1
 
@@ -197,14 +369,30 @@ def headline_len(title: str) -> int:
 def sanitize_note(note: str) -> str:
     '''Remove or demote headings in the note content.'''
     # Replace reST heading patterns with plain text
-    sanitized_note = re.sub(
-        r'^(.*)\n[-=~^`]+\n', r'**\1**\n', note, flags=re.MULTILINE)
+    sanitized_note = heading_ptn.sub(
+        lambda m: f'**{(m.group(1) or m.group(2)).rstrip()}**\n', note)
     return sanitized_note
 
 
+def render_module(src_file: Path, module_name: str) -> list[tuple[str, str]]:
+    '''Render document comments in a VB module source file.
+
+    This doesn't depend on config or notes, so it can run in a worker
+    process.
+
+    Returns
+    -------
+    rendered : list of (str, str)
+        Pairs of reST content and function name (empty for module
+        description) per document comment.
+    '''
+    return [(doccomment.to_rest(module_name), doccomment.func_name)
+            for doccomment in read_doccomments(src_file)]
+
+
 def generate_module_content(
         src_file: Path, module_name: str, autodoc_path: AutodocPath,
-        app: Sphinx) -> str:
+        config: Any, rendered: list[tuple[str, str]] | None = None) -> str:
     '''Generate reST content per module
 
     Parameters
@@ -215,8 +403,10 @@ def generate_module_content(
         Module name to show in document.
     autodoc_path : AutodocPath
         AutodocPath object to be handled.
-    app : Sphinx
-        Sphinx application object.
+    config : Config
+        Sphinx config object, or any object having the same vb_* attributes.
+    rendered : list of (str, str), optional
+        Result of `render_module()` if it has already been called.
 
     Returns
     -------
@@ -227,14 +417,14 @@ def generate_module_content(
     content = f"\n{module_name}\n{'-' * headline_len(module_name)}\n\n"
 
     # Add label to module section if enabled.
-    if app.config.vb_autodoc_module_labels:
+    if config.vb_autodoc_module_labels:
 
         # Generate a target id for the function.
-        encode_ = app.config.vb_encode_invalid_labels
+        encode_ = config.vb_encode_invalid_labels
         target_id = to_safe_label(module_name, encode_)
 
-        if app.config.vb_add_docname_to_labels:
-            delimiter = app.config.vb_docname_label_delimiter
+        if config.vb_add_docname_to_labels:
+            delimiter = config.vb_docname_label_delimiter
             docname = autodoc_path.rst.replace('/', delimiter)
             label = docname + delimiter + target_id
         else:
@@ -246,32 +436,65 @@ def generate_module_content(
     if module_note:
         content += f"{sanitize_note(module_note)}\n\n"
 
-    with open(src_file, 'r', encoding='utf-8') as f:
-        for doccomment in extract_doccomments(f):
-            content += doccomment.to_rest(module_name)
-            func_note = autodoc_path.notes.get(
-                f'{module_name}.{doccomment.func_name}')
-            if func_note:
-                content += f"{sanitize_note(func_note)}\n\n"
+    if rendered is None:
+        rendered = render_module(src_file, module_name)
+
+    for rest, func_name in rendered:
+        content += rest
+        func_note = autodoc_path.notes.get(f'{module_name}.{func_name}')
+        if func_note:
+            content += f"{sanitize_note(func_note)}\n\n"
 
     return content
 
 
-def generate_rst_files(app: Sphinx):
-    '''Create/overwrite *.rst files based on VB source directory.
+def generate_rst_contents(
+        config: Any, confdir: str | Path, srcdir: str | Path,
+        executor: Executor | None = None) -> dict[Path, str]:
+    '''Generate reST content per page in `vb_autodoc_paths`.
 
-    This is called just after the builder is inited.
-    '''
-    if not app.config.vb_autodoc:
-        return
+    Parameters
+    ----------
+    config : Config
+        Sphinx config object, or any object having the same vb_* attributes.
+    confdir : str or Path
+        Directory which `src` in `vb_autodoc_paths` is relative to.
+    srcdir : str or Path
+        Directory which `rst` in `vb_autodoc_paths` is relative to.
+    executor : Executor, optional
+        If given, VB modules are rendered in parallel with it.
 
-    for path_info in app.config.vb_autodoc_paths:
+    Returns
+    -------
+    rst_files : dict
+        Destination file path -> reST content.
+    '''
+    pages = []
+    for path_info in config.vb_autodoc_paths:
         if len(path_info) < 3:
             raise ValueError('vb_autodoc_paths must have at least 3 elements.')
         if len(path_info) < 4:
             path_info = (*path_info, {})
 
         autodoc_path = AutodocPath(*path_info)
+        src_dir = Path(confdir) / autodoc_path.src
+        modules = []
+        # Sort files so that the order of modules doesn't vary.
+        for vb_file in sorted(os.listdir(src_dir)):
+            if vb_file.endswith(('.bas', '.vb', '.vbs')):
+                module_name = os.path.splitext(os.path.basename(vb_file))[0]
+                src_file = src_dir / vb_file
+                rendered = None
+                if executor:
+                    rendered = executor.submit(
+                        render_module, src_file, module_name)
+                modules.append((src_file, module_name, rendered))
+        pages.append((autodoc_path, modules))
+
+    # Destination file -> reST content.
+    rst_files: dict[Path, str] = {}
+
+    for autodoc_path, modules in pages:
         title = autodoc_path.title
         rst_content = f"{title}\n{'=' * headline_len(title)}\n\n"
 
@@ -280,20 +503,55 @@ def generate_rst_files(app: Sphinx):
         if page_note:
             rst_content += f"{sanitize_note(page_note)}\n\n"
 
-        src_dir = Path(app.confdir) / autodoc_path.src
-        for vb_file in os.listdir(src_dir):
-            if vb_file.endswith(('.bas', '.vb', '.vbs')):
-                module_name = os.path.splitext(os.path.basename(vb_file))[0]
-                src_file = src_dir / vb_file
-                rst_content += generate_module_content(
-                    src_file, module_name, autodoc_path, app)
-
-        dest_file = Path(app.srcdir) / (autodoc_path.rst + '.rst')
-        # Create the directory if it does not exist.
-        if not dest_file.parent.exists():
-            dest_file.parent.mkdir(parents=True)
-        with open(dest_file, 'w', encoding='utf-8') as f:
-            f.write(rst_content)
+        for src_file, module_name, rendered in modules:
+            if rendered is not None:
+                rendered = rendered.result()
+            rst_content += generate_module_content(
+                src_file, module_name, autodoc_path, config, rendered)
+
+        dest_file = Path(srcdir) / (autodoc_path.rst + '.rst')
+        rst_files[dest_file] = rst_content
+
+    return rst_files
+
+
+def write_rst_files(rst_files: dict[Path, str], srcdir: str | Path
+                    ) -> list[Path]:
+    '''Write pages made by `generate_rst_contents()`.
+
+    Pages are written under a lock for `srcdir` (see `lock_file_for()`) so
+    that concurrent builds sharing it don't interleave. Pages whose content is unchanged
+    are not written.
+
+    Returns
+    -------
+    written : list of Path
+        Files actually written.
+    '''
+    if not rst_files:
+        return []
+
+    written = []
+    with file_lock(lock_file_for(srcdir)):
+        # Create the directories at once if they do not exist.
+        for dest_dir in {dest_file.parent for dest_file in rst_files}:
+            dest_dir.mkdir(parents=True, exist_ok=True)
+        for dest_file, rst_content in rst_files.items():
+            if write_if_changed(dest_file, rst_content):
+                written.append(dest_file)
+    return written
+
+
+def generate_rst_files(app: Sphinx):
+    '''Create/overwrite *.rst files based on VB source directory.
+
+    This is called just after the builder is inited.
+    '''
+    if not app.config.vb_autodoc:
+        return
+
+    rst_files = generate_rst_contents(app.config, app.confdir, app.srcdir)
+    write_rst_files(rst_files, app.srcdir)
 
 
 def setup(app: Sphinx):
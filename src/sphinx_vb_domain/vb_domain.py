@@ -1,20 +1,38 @@
+from __future__ import annotations
+
+import hashlib
+import json
 import re
+from pathlib import Path
+from typing import TYPE_CHECKING
 
 from docutils import nodes
-from docutils.nodes import Element, Node
+from docutils.nodes import Element, Node, fully_normalize_name
 from docutils.parsers.rst import Directive, directives
 from sphinx import addnodes
 from sphinx.addnodes import desc_content, desc_signature, pending_xref
-from sphinx.application import Sphinx
-from sphinx.builders import Builder
-from sphinx.directives import ObjDescT, ObjectDescription
+from sphinx.directives import ObjectDescription
 from sphinx.domains import Domain, ObjType
-from sphinx.environment import BuildEnvironment
 from sphinx.roles import XRefRole
+from sphinx.util import logging
 from sphinx.util.docfields import DocFieldTransformer, Field, TypedField
 from sphinx.util.nodes import make_refnode
 
-from .utils import to_safe_label
+from .utils import normalize_width, to_safe_label, write_if_changed
+
+if TYPE_CHECKING:
+    from sphinx.application import Sphinx
+    from sphinx.builders import Builder
+    from sphinx.directives import ObjDescT
+    from sphinx.environment import BuildEnvironment
+
+logger = logging.getLogger(__name__)
+
+
+# Regex pattern for parameter name (e.g. 'ByVal name As String' -> 'name').
+param_name_ptn = re.compile(
+    r'^(?:(?:Optional|ByVal|ByRef|ParamArray)\s+)*([^\s\(=]+)',
+    re.IGNORECASE)
 
 
 class VBXRefRole(XRefRole):
@@ -78,6 +96,12 @@ class VBFunction(ObjectDescription):
             args = [arg.strip() for arg in parameters.split(',')]
         else:
             args = []
+        # Keep parameter names for search index.
+        self.param_names = []
+        for arg in args:
+            param_match = param_name_ptn.match(arg)
+            if param_match:
+                self.param_names.append(param_match.group(1))
         # Part 3: return type.
         return_type = match.group(3).removeprefix("As").strip() \
             if match.group(3) else ""
@@ -203,8 +227,70 @@ class VBFunction(ObjectDescription):
         # ローカルなターゲット id は MyST でないと作られないのかも知れない。
         self.state.document.note_explicit_target(section_node)
 
+        # Register symbols for search index.
+        # note_explicit_target() has given an id to section_node if none.
+        self.register_symbols(section_node['ids'][0])
+
         return [section_node]
 
+    def content_hash(self) -> str:
+        '''Hash of the directive source (signature, options and content).
+
+        This doesn't depend on the position in the document, so it changes
+        only when the function's own document changes.
+        '''
+        options = sorted(self.options.items())
+        source = '\n'.join([
+            *self.arguments,
+            *(f':{key}: {value}' for key, value in options),
+            '',
+            *self.content,
+        ])
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+
+    def register_symbols(self, anchor: str):
+        '''Register the function, its module and parameters to domain data.
+        '''
+        docname = self.env.docname
+        domain_data = self.env.domaindata['vb']
+        func_fullname = self.names[0]
+        domain_data['functions'][docname, func_fullname] = (
+            docname, anchor, self.content_hash())
+
+        for param_name in self.param_names:
+            param_fullname = f'{func_fullname}.{param_name}'
+            domain_data['parameters'][docname, param_fullname] = (
+                docname, anchor)
+
+        module_name = self.options.get('module', '')
+        if not module_name or (docname, module_name) in domain_data['modules']:
+            return
+
+        # Link to the module section if the function is in it (autodoc).
+        # Otherwise, link to the first function in the module.
+        section = self.state.parent
+        if (isinstance(section, nodes.section) and section['ids']
+                and section.next_node(nodes.title).astext() == module_name):
+            anchor = self.module_label_id(module_name) or section['ids'][0]
+        domain_data['modules'][docname, module_name] = (docname, anchor)
+
+    def module_label_id(self, module_name: str) -> str | None:
+        '''Id of the label added to the module section by vb_autodoc.
+
+        Ids of the section itself are given by its position in the document
+        (e.g. 'id1'), as the label is applied to it after parsing.
+        '''
+        config = self.env.config
+        if not config.vb_autodoc_module_labels:
+            return None
+
+        label = to_safe_label(module_name, config.vb_encode_invalid_labels)
+        if config.vb_add_docname_to_labels:
+            delimiter = config.vb_docname_label_delimiter
+            docname = self.env.docname.replace('/', delimiter)
+            label = docname + delimiter + label
+        return self.state.document.nameids.get(fully_normalize_name(label))
+
 
 class VBModule(Directive):
     '''For module directive (vb:module).
@@ -236,6 +322,8 @@ class VBDomain(Domain):
 
     object_types = {
         'function': ObjType('function', 'func', 'obj'),
+        'module': ObjType('module', 'mod', 'obj'),
+        'parameter': ObjType('parameter'),
     }
     directives = {
         'function': VBFunction,
@@ -248,11 +336,54 @@ class VBDomain(Domain):
 
     # autodoc で使われる情報を保持する辞書の、初期値
     initial_data = {
-        # "functions": {},  # function name -> (docname, synopsis)
+        # Keyed also by docname, as the same name may be in several documents.
+        "functions": {},   # (docname, function name) -> (docname, anchor, hash)
         # "classes": {},    # class name -> (docname, synopsis)
-        # "modules": {},    # module name -> (docname, synopsis)
+        "modules": {},     # (docname, module name) -> (docname, anchor)
+        "parameters": {},  # (docname, parameter name) -> (docname, anchor)
         "objects": {},    # object name -> (docname, objtype, signature)
     }
+    data_version = 3
+
+    # Search priority per symbol type (see `Domain.get_objects()`).
+    search_priorities = {
+        'function': 1,
+        'module': 1,
+        'parameter': 2,
+    }
+
+    def __init__(self, env: BuildEnvironment):
+        super().__init__(env)
+        # Unresolved references: (target, typ) -> locations.
+        self.unresolved_refs: dict[tuple[str, str], list[str]] = {}
+
+    def clear_doc(self, docname: str):
+        for key in ('functions', 'modules', 'parameters', 'objects'):
+            data = self.data[key]
+            for name, obj in list(data.items()):
+                if obj[0] == docname:
+                    del data[name]
+
+    def merge_domaindata(self, docnames: set[str], otherdata: dict):
+        for key in ('functions', 'modules', 'parameters', 'objects'):
+            for name, obj in otherdata[key].items():
+                if obj[0] in docnames:
+                    self.data[key].setdefault(name, obj)
+
+    def get_objects(self):
+        '''Yield VB symbols for search index and inventory.
+
+        Display names are normalized in NFKC, so that full-width and
+        half-width characters are matched as the same (see
+        `search_query_js`).
+        '''
+        for objtype, key in (('function', 'functions'),
+                             ('module', 'modules'),
+                             ('parameter', 'parameters')):
+            priority = self.search_priorities[objtype]
+            for (_, name), (docname, anchor, *_) in self.data[key].items():
+                yield (name, normalize_width(name), objtype, docname, anchor,
+                       priority)
 
     def resolve_xref(
             self, env: BuildEnvironment, fromdocname: str, builder: Builder,
@@ -291,10 +422,119 @@ class VBDomain(Domain):
         return results
 
 
+# Normalize query terms for objects on search page, as `VBDomain` does for
+# names in search index.
+search_query_js = '''
+document.addEventListener('DOMContentLoaded', () => {
+  if (typeof Search === 'undefined' || !Search._parseQuery) return;
+  const parseQuery = Search._parseQuery;
+  Search._parseQuery = (query) => {
+    const parsed = parseQuery(query);
+    parsed[4] = new Set([...parsed[4]].map((term) => term.normalize('NFKC')));
+    return parsed;
+  };
+});
+'''
+
+
+def add_search_query_js(
+        app: Sphinx, pagename: str, templatename: str, context: dict,
+        doctree: Node | None):
+    '''Add `search_query_js` to search page.
+    '''
+    if pagename == 'search':
+        app.add_js_file(None, body=search_query_js)
+
+
+def write_function_manifest(app: Sphinx, exception: Exception | None):
+    '''Write manifest of functions to `vb_manifest.json` in output dir.
+
+    The manifest maps each function to its content hash, output file and
+    anchor per file defining it, and each output file to a hash of its
+    rendered content, so that publishing can sync only changed pages.
+    This is called when the build is finished.
+    '''
+    if (exception or not app.config.vb_function_manifest
+            or app.builder.format != 'html'):
+        return
+
+    builder = app.builder
+    # Function name -> entries, as the same name may be in several files.
+    functions = {}
+    # Output file -> docname.
+    file_docnames = {}
+    domain_data = app.env.domaindata['vb']
+    for (_, name), (docname, anchor, hash_) in sorted(
+            domain_data['functions'].items()):
+        file = builder.get_target_uri(docname)
+        functions.setdefault(name, []).append(
+            {'hash': hash_, 'file': file, 'anchor': anchor})
+        file_docnames[file] = docname
+
+    # Hash the whole output file, as notes and other content around the
+    # functions also change it.
+    files = {}
+    for file, docname in file_docnames.items():
+        try:
+            content = Path(builder.get_outfilename(docname)).read_bytes()
+        except FileNotFoundError:
+            continue
+        files[file] = hashlib.sha256(content).hexdigest()[:16]
+
+    manifest = {'functions': functions, 'files': files}
+    content = json.dumps(manifest, ensure_ascii=False, indent=2,
+                         sort_keys=True)
+    write_if_changed(Path(app.outdir) / 'vb_manifest.json', content + '\n')
+
+
+def note_unresolved_ref(
+        app: Sphinx, domain: Domain | None, node: pending_xref) -> bool:
+    '''Note VB reference instead of warning it per node.
+
+    This is connected to 'warn-missing-reference', which Sphinx emits only
+    for references to be warned (e.g. in nitpicky mode, not matching
+    nitpick_ignore), after all resolvers (e.g. intersphinx) failed.
+    Noted references are warned at once by `report_unresolved_refs()`.
+    '''
+    if (domain is None or domain.name != 'vb'
+            or node.get('reftype') not in domain.object_types):
+        return False
+
+    key = (node['reftarget'], node['reftype'])
+    location = node.get('refdoc', '')
+    if node.line:
+        location += f':{node.line}'
+    domain.unresolved_refs.setdefault(key, []).append(location)
+    return True
+
+
+def report_unresolved_refs(app: Sphinx, exception: Exception | None):
+    '''Warn unresolved VB references at once when the build is finished.
+    '''
+    if exception:
+        return
+
+    unresolved_refs = app.env.get_domain('vb').unresolved_refs
+    if not unresolved_refs:
+        return
+
+    lines = []
+    for (target, typ), locations in sorted(unresolved_refs.items()):
+        lines.append(f'  vb:{typ}:`{target}` ({", ".join(locations)})')
+    logger.warning(
+        '%d VB reference target(s) not found:\n%s',
+        len(unresolved_refs), '\n'.join(lines), type='ref', subtype='vb')
+    unresolved_refs.clear()
+
+
 def setup(app: Sphinx):
     '''Set up vb_domain feature.
     '''
     app.add_domain(VBDomain)
+    app.connect('html-page-context', add_search_query_js)
+    app.connect('build-finished', write_function_manifest)
+    app.connect('warn-missing-reference', note_unresolved_ref)
+    app.connect('build-finished', report_unresolved_refs)
 
     # Config parameter to add function labels as reference targets.
     # This should be False if user enables sphinx.ext.autosectionlabel.
@@ -310,3 +550,6 @@ def setup(app: Sphinx):
 
     # Config parameter to set delimiter between module name and function name.
     app.add_config_value('vb_docname_label_delimiter', '-', 'env', str)
+
+    # Config parameter to write vb_manifest.json (function -> hash, file).
+    app.add_config_value('vb_function_manifest', False, '', bool)
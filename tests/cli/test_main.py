@@ -0,0 +1,45 @@
+from pathlib import Path
+
+from sphinx_vb_domain.cli import main
+
+MACROS_DIR = Path(__file__).parents[2] / 'macros' / '001'
+
+
+def test_generate_and_check(tmp_path):
+    args = [str(tmp_path), '-C', '-p', str(MACROS_DIR), 'modules/index',
+            'Modules']
+
+    assert main([*args, '--check']) == 1
+    assert main(args) == 0
+    dest_file = tmp_path / 'modules' / 'index.rst'
+    assert dest_file.read_text(encoding='utf-8').startswith('Modules\n===')
+    assert main([*args, '--check']) == 0
+
+
+def test_load_conf_py(tmp_path):
+    (tmp_path / 'conf.py').write_text(
+        f'vb_autodoc_paths = [({str(MACROS_DIR)!r}, "modules", "Modules")]\n'
+        'vb_autodoc_module_labels = True\n',
+        encoding='utf-8')
+
+    args = [str(tmp_path), '-D', 'vb_add_docname_to_labels=1',
+            '-D', 'vb_docname_label_delimiter=__']
+    assert main(args) == 0
+    content = (tmp_path / 'modules.rst').read_text(encoding='utf-8')
+    assert '.. _modules__module1:' in content
+
+
+def test_tags_in_conf_py(tmp_path):
+    (tmp_path / 'conf.py').write_text(
+        f'vb_autodoc_paths = [({str(MACROS_DIR)!r}, "modules", "Modules")]\n'
+        'if tags.has("labels"):\n'
+        '    vb_autodoc_module_labels = True\n',
+        encoding='utf-8')
+
+    assert main([str(tmp_path)]) == 0
+    content = (tmp_path / 'modules.rst').read_text(encoding='utf-8')
+    assert '.. _module1:' not in content
+
+    assert main([str(tmp_path), '-t', 'labels']) == 0
+    content = (tmp_path / 'modules.rst').read_text(encoding='utf-8')
+    assert '.. _module1:' in content
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import time allowed for a module (microseconds).
+# This is generous for slow CI machines; the actual time is a few ms.
+BUDGET_US = 50_000
+
+# Modules which should be loaded only when the features are used.
+HEAVY_MODULES = (
+    'sphinx.application',
+    'sphinx.domains',
+    'sphinx_vb_domain.vb_domain',
+    'sphinx_vb_domain.vb_autodoc',
+    'xml.etree.ElementTree',
+    'unicodedata',
+    'hashlib',
+)
+
+
+def import_times(code: str) -> dict[str, int]:
+    '''Run code in a new process and return cumulative import times.
+    '''
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, env=env, check=True)
+
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.removeprefix('import time:').split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize('module', [
+    'sphinx_vb_domain',
+    'sphinx_vb_domain.utils',
+])
+def test_import_time(module):
+    # Modules already loaded at interpreter startup don't count.
+    startup = import_times('pass')
+    times = import_times(f'import {module}')
+
+    loaded = [name for name in HEAVY_MODULES
+              if name in times and name not in startup]
+    assert not loaded, f'{module} loads {loaded}'
+    assert times[module] < BUDGET_US
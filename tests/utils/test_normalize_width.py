@@ -0,0 +1,13 @@
+from sphinx_vb_domain.utils import normalize_width
+
+
+def test_full_width_to_half_width():
+    assert normalize_width('モジュール１.関数Ａ') == 'モジュール1.関数A'
+
+
+def test_half_width_katakana_to_full_width():
+    assert normalize_width('ﾓｼﾞｭｰﾙ1') == 'モジュール1'
+
+
+def test_ascii_unchanged():
+    assert normalize_width('Module1.Function1') == 'Module1.Function1'
@@ -0,0 +1,22 @@
+from sphinx_vb_domain.utils import notes_from_template
+
+
+def notes(tmp_path, content: str) -> dict:
+    template = tmp_path / 'notes.rst'
+    template.write_text(content, encoding='utf-8')
+    return notes_from_template(str(template), encode_keys=False)
+
+
+def test_underlined_headings(tmp_path):
+    content = 'A\n-\n\nnote a\n\nB\n~\n\nnote b\n'
+    assert notes(tmp_path, content) == {'A': 'note a', 'B': 'note b'}
+
+
+def test_overlined_heading(tmp_path):
+    content = 'A\n-\n\nnote a\n\n-----\nB\n-----\n\nnote b\n'
+    assert notes(tmp_path, content) == {'A': 'note a', 'B': 'note b'}
+
+
+def test_transition_is_not_heading(tmp_path):
+    content = 'A\n-\n\nnote a\n\n----\n\nmore a\n'
+    assert notes(tmp_path, content) == {'A': 'note a\n\n----\n\nmore a'}
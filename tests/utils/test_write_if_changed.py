@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+from sphinx_vb_domain.utils import lock_file_for, write_if_changed
+
+
+def test_write_new_file(tmp_path):
+    dest_file = tmp_path / 'index.rst'
+    assert write_if_changed(dest_file, 'タイトル\n') is True
+    assert dest_file.read_text(encoding='utf-8') == 'タイトル\n'
+    # No temporary file is left.
+    assert [p.name for p in tmp_path.iterdir()] == ['index.rst']
+
+
+def test_skip_unchanged_file(tmp_path):
+    dest_file = tmp_path / 'index.rst'
+    write_if_changed(dest_file, 'Title\n')
+    mtime = dest_file.stat().st_mtime_ns
+    assert write_if_changed(dest_file, 'Title\n') is False
+    assert dest_file.stat().st_mtime_ns == mtime
+
+
+def test_overwrite_changed_file(tmp_path):
+    dest_file = tmp_path / 'index.rst'
+    write_if_changed(dest_file, 'Title\n')
+    assert write_if_changed(dest_file, 'New title\n') is True
+    assert dest_file.read_text(encoding='utf-8') == 'New title\n'
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='POSIX permissions')
+def test_new_file_respects_umask(tmp_path):
+    old_umask = os.umask(0o027)
+    try:
+        write_if_changed(tmp_path / 'index.rst', 'Title\n')
+    finally:
+        os.umask(old_umask)
+    assert (tmp_path / 'index.rst').stat().st_mode & 0o777 == 0o640
+
+
+def test_lock_file_is_outside_directory(tmp_path):
+    lock_file = lock_file_for(tmp_path)
+    assert tmp_path not in lock_file.parents
+    assert lock_file == lock_file_for(tmp_path / 'sub' / '..')
+    assert lock_file != lock_file_for(tmp_path / 'sub')
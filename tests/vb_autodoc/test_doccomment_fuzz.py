@@ -0,0 +1,122 @@
+'''Property-based tests that the doc comment pipeline survives any input.
+'''
+from io import StringIO
+
+import pytest
+
+pytest.importorskip('hypothesis')
+
+from docutils import nodes  # noqa: E402
+from docutils.core import publish_doctree  # noqa: E402
+from hypothesis import given  # noqa: E402
+from hypothesis import strategies as st  # noqa: E402
+
+from sphinx_vb_domain.vb_autodoc import (  # noqa: E402
+    DocComment, extract_doccomments, sanitize_note, xml_to_dict)
+
+# Pieces of (often malformed) document comment.
+xml_pieces = st.one_of(
+    st.text(max_size=10),
+    st.sampled_from([
+        '<summary>', '</summary>', '<param name="x">', '<param>',
+        "<param name='名前'>", '</param>', '<returns>', '</returns>',
+        '<remarks>', '</remarks>', '<see cref="a"/>', '<br/>', '&', '&amp;',
+        '&#x41;', '<', '>', '"', "'", '\n', '</root>', '<!--', ']]>',
+    ]),
+)
+xml_strings = st.lists(xml_pieces, max_size=30).map(''.join)
+
+signatures = st.one_of(
+    st.just(''),
+    st.sampled_from([
+        'Sub f()',
+        'Public Function g(ByVal x As Integer, y) As String',
+        'Private Sub 関数A(ByRef 名前 As String)',
+    ]),
+    st.text(max_size=30).map(lambda s: f'Sub {s}'),
+)
+
+source_lines = st.one_of(
+    xml_strings.map(lambda s: "'''" + s.split('\n')[0]),
+    signatures,
+    st.text(max_size=30),
+    st.sampled_from(['', 'End Sub', "' comment", 'Dim x As Integer']),
+)
+
+
+@given(xml_strings)
+def test_xml_to_dict(xml):
+    result = xml_to_dict(xml)
+    assert all(isinstance(v, str) for v in result.values())
+
+
+@given(xml_strings, signatures)
+def test_to_rest(xml, sig):
+    rest = DocComment(xml, sig).to_rest('Module1')
+    assert isinstance(rest, str)
+    if sig:
+        assert rest.startswith(f'.. vb:function:: {sig}\n')
+
+
+@given(st.lists(source_lines, max_size=30))
+def test_extract_doccomments(lines):
+    source = '\n'.join(lines)
+    for doccomment in extract_doccomments(StringIO(source)):
+        assert isinstance(doccomment.to_rest('Module1'), str)
+
+
+# Notes of paragraphs, transitions and headings, whose overline and
+# underline may be missing or not match.
+words = st.from_regex(r'\A\w[\w ]{0,9}\Z')
+adornments = st.builds(lambda char, n: char * n,
+                       st.sampled_from('-=~^`:#*+'), st.integers(1, 12))
+headings = st.one_of(
+    st.tuples(words, adornments),
+    st.tuples(adornments, words, adornments),
+    st.tuples(adornments, words),
+).map('\n'.join)
+paragraphs = st.lists(words, min_size=1, max_size=3).map('\n'.join)
+notes = st.lists(
+    st.one_of(headings, paragraphs, st.just('----')), max_size=10,
+).map('\n\n'.join)
+
+
+@given(notes)
+def test_sanitize_note(note):
+    # Headings left in the note make docutils reject the page (SEVERE),
+    # e.g. "Missing matching underline for section title overline".
+    doctree = publish_doctree(sanitize_note(note), settings_overrides={
+        'report_level': 5, 'halt_level': 5})
+    messages = doctree.findall(nodes.system_message)
+    assert all(message['level'] < 4 for message in messages)
+
+
+def test_sanitize_overlined_heading():
+    assert sanitize_note('-----\nTitle\n-----\n\ntext\n') == (
+        '**Title**\n\ntext\n')
+
+
+def test_malformed_xml_is_recovered():
+    xml = ('<summary>a < b & c</summary>\n'
+           '<param name="x">x & y</param>\n'
+           '<returns>unclosed')
+    assert xml_to_dict(xml) == {
+        'summary': 'a < b & c',
+        'param x': 'x & y',
+        'returns': 'unclosed',
+    }
+
+
+def test_module_is_processed_after_malformed_xml():
+    source = (
+        "'''<summary>Tom & Jerry</summary>\n"
+        "Sub f(x As Integer)\n"
+        "End Sub\n"
+        "'''<summary>second</summary>\n"
+        "Sub g()\n"
+    )
+    rests = [c.to_rest('Module1') for c in extract_doccomments(
+        StringIO(source))]
+    assert len(rests) == 2
+    assert '   Tom & Jerry\n' in rests[0]
+    assert '   second\n' in rests[1]
@@ -0,0 +1,77 @@
+'''Throughput tests of the doc comment pipeline.
+
+Time limits are generous for slow CI machines; they fail only if some step
+takes quadratic time on large input.
+'''
+import time
+from io import StringIO
+
+import pytest
+
+from sphinx_vb_domain.vb_autodoc import (
+    DocComment, extract_doccomments, sanitize_note, xml_to_dict)
+
+TIME_LIMIT = 2.0  # seconds
+
+PATHOLOGICAL_XML = [
+    '<summary>' * 20_000,
+    '<' * 100_000,
+    '&' * 100_000,
+    '<a' * 50_000,
+    '<param name="x' * 20_000,
+    '<summary>' + '</b>' * 30_000,
+    '<summary>' + ' ' * 100_000 + 'x',
+    '<summary ' + 'a' * 100_000 + '>',
+    '<summary' + 'a' * 100_000,
+]
+
+PATHOLOGICAL_NOTES = [
+    'a' + ' ' * 100_000 + 'b\n---\n',
+    'Title\n' + '-' * 100_000 + 'x',
+    'a\n-\n' * 30_000,
+    ' ' * 100_000,
+    '-----\nTitle\n' * 30_000,
+    '-' * 100_000 + '\n' + 'a' * 100_000,
+]
+
+
+def elapsed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+@pytest.mark.parametrize('xml', PATHOLOGICAL_XML)
+def test_xml_to_dict(xml):
+    assert elapsed(xml_to_dict, xml) < TIME_LIMIT
+
+
+@pytest.mark.parametrize('xml', PATHOLOGICAL_XML)
+def test_to_rest(xml):
+    doccomment = DocComment(xml, 'Sub f(ByVal x As Integer)')
+    assert elapsed(doccomment.to_rest, 'Module1') < TIME_LIMIT
+
+
+@pytest.mark.parametrize('note', PATHOLOGICAL_NOTES)
+def test_sanitize_note(note):
+    assert elapsed(sanitize_note, note) < TIME_LIMIT
+
+
+def test_large_module():
+    procedure = (
+        "'''<summary>\n"
+        "'''手続き {0} & その説明\n"
+        "'''</summary>\n"
+        "'''<param name=\"x\">引数</param>\n"
+        "'''<returns>戻り値</returns>\n"
+        "Public Function func{0}(ByVal x As Integer) As String\n"
+        "    func{0} = \"Sub\"\n"
+        "End Function\n\n"
+    )
+    source = ''.join(procedure.format(i) for i in range(5_000))
+
+    def process():
+        for doccomment in extract_doccomments(StringIO(source)):
+            doccomment.to_rest('Module1')
+
+    assert elapsed(process) < TIME_LIMIT
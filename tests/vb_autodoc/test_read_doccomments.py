@@ -0,0 +1,68 @@
+import pytest
+
+from sphinx_vb_domain.vb_autodoc import (
+    MMAP_THRESHOLD, extract_doccomments, read_doccomments)
+
+HEAD = (
+    "Attribute VB_Name = \"モジュール1\"\n"
+    "'''<summary>モジュールの説明</summary>\n"
+    "\n"
+    "'''<summary>\n"
+    "'''かんたんなプロシージャ\n"
+    "'''</summary>\n"
+    "Sub sampleProcedure()\n"
+    "    Call OtherSub(1)\n"
+    "End Sub\n"
+    "Const SubTotal = 1\n"
+)
+TAIL = (
+    "　''' <summary>全角スペースで字下げ</summary>\n"
+    "  Private Function 関数A(ByVal x As Integer) As String\n"
+    "End Function\n"
+    "'''<remarks>ファイル末尾</remarks>"
+)
+
+
+def doccomments(iterable):
+    return [(c.xml, c.sig) for c in iterable]
+
+
+@pytest.mark.parametrize('newline', ['\n', '\r\n', '\r'])
+def test_same_result_as_text_mode(tmp_path, newline):
+    table = 'Data = Array(1, 2, 3) \' lookup table\n' * (
+        MMAP_THRESHOLD // 30)
+    content = HEAD + table + TAIL
+    src_file = tmp_path / 'Module1.bas'
+    src_file.write_text(content, encoding='utf-8', newline=newline)
+    assert src_file.stat().st_size >= MMAP_THRESHOLD
+
+    with open(src_file, 'r', encoding='utf-8') as f:
+        expected = doccomments(extract_doccomments(f))
+
+    assert len(expected) == 4
+    assert doccomments(read_doccomments(src_file)) == expected
+
+
+def test_undecodable_bytes_are_not_decoded(tmp_path):
+    src_file = tmp_path / 'Module1.bas'
+    table = b'Data = "\xff\xfe"\n' * (MMAP_THRESHOLD // 10)
+    src_file.write_bytes(HEAD.encode('utf-8') + table)
+
+    result = doccomments(read_doccomments(src_file))
+    assert result[-1] == (
+        '<summary>\nかんたんなプロシージャ\n</summary>', 'Sub sampleProcedure()')
+
+
+def test_mixed_newlines(tmp_path):
+    table = 'Data = Array(1, 2, 3)\r\n' * (MMAP_THRESHOLD // 20)
+    # Lone CR within lines of doc comment and signature, and at EOF.
+    content = (HEAD.replace('\n', '\r\n') + table
+               + TAIL.replace('\n', '\r', 2) + "\r'''x\ry")
+    src_file = tmp_path / 'Module1.bas'
+    src_file.write_bytes(content.encode('utf-8'))
+    assert src_file.stat().st_size >= MMAP_THRESHOLD
+
+    with open(src_file, 'r', encoding='utf-8') as f:
+        expected = doccomments(extract_doccomments(f))
+
+    assert doccomments(read_doccomments(src_file)) == expected
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+from sphinx.cmd.build import build_main
+
+CONF = '''
+extensions = ['sphinx_vb_domain']
+language = 'ja'
+'''
+
+
+@pytest.fixture
+def build_project(tmp_path):
+    '''Function to build a Sphinx project with html builder.
+
+    The function takes conf.py lines added to `CONF`, reST contents per
+    docname and name of the project directory in `tmp_path`, and returns
+    the output directory and warnings.
+    '''
+    def build(conf: str, files: dict[str, str],
+              name: str = 'project') -> tuple[Path, str]:
+        srcdir = tmp_path / name / 'src'
+        outdir = tmp_path / name / 'out'
+        warning_file = tmp_path / name / 'warnings.txt'
+        srcdir.mkdir(parents=True)
+        (srcdir / 'conf.py').write_text(CONF + conf, encoding='utf-8')
+        for docname, content in files.items():
+            rst_file = srcdir / f'{docname}.rst'
+            rst_file.parent.mkdir(parents=True, exist_ok=True)
+            rst_file.write_text(content, encoding='utf-8')
+
+        args = ['-q', '-b', 'html', '-w', str(warning_file), str(srcdir),
+                str(outdir)]
+        assert build_main(args) == 0
+        return outdir, warning_file.read_text(encoding='utf-8')
+
+    return build
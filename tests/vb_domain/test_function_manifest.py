@@ -0,0 +1,78 @@
+import json
+import re
+
+CONF = '''
+vb_function_manifest = True
+'''
+
+TITLE = 'Title\n=====\n\n'
+
+GET_ID = '''
+.. vb:function:: Function getId(ByVal name As String) As Integer
+   :module: Module1
+
+   Get id.
+'''
+
+PRINT_ID = '''
+.. vb:function:: Sub printId()
+   :module: Module1
+
+   Print id.
+'''
+
+
+def build(build_project, index: str, name: str = 'project',
+          files: dict[str, str] | None = None) -> dict:
+    outdir, _ = build_project(CONF, {'index': index, **(files or {})}, name)
+    return json.loads((outdir / 'vb_manifest.json').read_text('utf-8'))
+
+
+def test_manifest(build_project):
+    manifest = build(build_project, TITLE + GET_ID + PRINT_ID)
+
+    [get_id] = manifest['functions']['Module1.getId']
+    assert re.fullmatch(r'[0-9a-f]{16}', get_id.pop('hash'))
+    assert get_id == {'file': 'index.html', 'anchor': 'module1.getid'}
+    assert list(manifest['files']) == ['index.html']
+    assert re.fullmatch(r'[0-9a-f]{16}', manifest['files']['index.html'])
+
+
+def test_hash_changes_only_for_changed_function(build_project):
+    manifest = build(build_project, TITLE + GET_ID + PRINT_ID)
+
+    # Reorder the functions and change one of them.
+    changed_print_id = PRINT_ID.replace('Print id.', 'Show id.')
+    changed = build(
+        build_project, TITLE + changed_print_id + GET_ID, 'changed')
+
+    functions = manifest['functions']
+    changed_functions = changed['functions']
+    assert changed_functions['Module1.getId'] == functions['Module1.getId']
+    assert (changed_functions['Module1.printId'][0]['hash']
+            != functions['Module1.printId'][0]['hash'])
+    assert changed['files']['index.html'] != manifest['files']['index.html']
+
+
+def test_file_hash_changes_for_non_function_change(build_project):
+    manifest = build(build_project, TITLE + GET_ID + PRINT_ID)
+
+    # Add a paragraph (e.g. note) between the functions.
+    changed = build(
+        build_project, TITLE + GET_ID + '\nNote.\n' + PRINT_ID, 'changed')
+
+    assert changed['functions'] == manifest['functions']
+    assert changed['files']['index.html'] != manifest['files']['index.html']
+
+
+def test_same_function_in_documents(build_project):
+    index = TITLE + '.. toctree::\n\n   a\n   b\n'
+    manifest = build(build_project, index, files={
+        'a': 'A\n=\n' + GET_ID,
+        'b': 'B\n=\n' + GET_ID.replace('Get id.', 'Get id of name.'),
+    })
+
+    get_id = manifest['functions']['Module1.getId']
+    assert [entry['file'] for entry in get_id] == ['a.html', 'b.html']
+    assert get_id[0]['hash'] != get_id[1]['hash']
+    assert sorted(manifest['files']) == ['a.html', 'b.html']
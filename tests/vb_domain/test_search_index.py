@@ -0,0 +1,72 @@
+import json
+
+CONF = '''
+vb_autodoc_module_labels = True
+'''
+
+INDEX = '''
+Title
+=====
+
+.. toctree::
+
+   a
+   b
+'''
+
+# Same module and function in two documents, as generated by vb_autodoc.
+MODULE = '''
+{title}
+=====
+
+.. _{label}:
+
+{module}
+{underline}
+
+.. vb:function:: Function getId(ByVal name As String) As Integer
+   :module: {module}
+
+   Get id.
+'''
+
+
+def search_objects(outdir) -> list[tuple[str, str, str]]:
+    '''(docname, name, anchor) of VB objects in search index.'''
+    content = (outdir / 'searchindex.js').read_text(encoding='utf-8')
+    index = json.loads(content[content.index('(') + 1:content.rindex(')')])
+    return sorted(
+        (index['docnames'][doc], f'{prefix}.{name}'.lstrip('.'), anchor)
+        for prefix, entries in index['objects'].items()
+        for doc, _, _, anchor, name in entries)
+
+
+def module_rst(title: str, module: str, label: str) -> str:
+    return MODULE.format(title=title, module=module, label=label,
+                         underline='-' * len(module) * 2)
+
+
+def test_same_names_in_documents(build_project):
+    outdir, warnings = build_project(CONF, {
+        'index': INDEX,
+        'a': module_rst('DocA', 'Module1', 'module1'),
+        'b': module_rst('DocB', 'Module1', 'module1'),
+    })
+
+    objects = search_objects(outdir)
+    for docname in ('a', 'b'):
+        assert (docname, 'Module1', 'module1') in objects
+        assert (docname, 'Module1.getId', 'module1.getid') in objects
+        assert (docname, 'Module1.getId.name', 'module1.getid') in objects
+
+
+def test_module_anchor_is_label(build_project):
+    outdir, _ = build_project(CONF, {
+        'index': INDEX,
+        'a': module_rst('DocA', 'Module1', 'module1'),
+        'b': module_rst('DocB', 'モジュール1', 'x4cd94f36'),
+    })
+
+    objects = search_objects(outdir)
+    assert ('a', 'Module1', 'module1') in objects
+    assert ('b', 'モジュール1', 'x4cd94f36') in objects
@@ -0,0 +1,50 @@
+import re
+
+INDEX = '''
+Title
+=====
+
+.. vb:function:: Function getId(ByVal name As String) As Integer
+   :module: Module1
+
+   Get id.
+
+* :vb:function:`module1.getid`
+* :vb:function:`Module1.missing`
+* :vb:function:`Module1.missing`
+* :vb:function:`Module2.missing`
+'''
+
+
+def build(build_project, conf: str) -> str:
+    '''Build INDEX with conf and return warnings.'''
+    outdir, warnings = build_project(conf, {'index': INDEX})
+    html = (outdir / 'index.html').read_text(encoding='utf-8')
+    assert 'href="#module1.getid"' in html
+    return warnings
+
+
+def test_report_unresolved_refs_at_once(build_project):
+    warnings = build(build_project, 'nitpicky = True\n')
+
+    assert warnings.count('not found') == 1
+    assert '2 VB reference target(s) not found' in warnings
+    assert re.search(
+        r'vb:function:`Module1.missing` \(index:\d+, index:\d+\)', warnings)
+    assert re.search(r'vb:function:`Module2.missing` \(index:\d+\)', warnings)
+    assert 'getid' not in warnings
+
+
+def test_no_warning_without_nitpicky(build_project):
+    assert build(build_project, '') == ''
+
+
+def test_nitpick_ignore(build_project):
+    warnings = build(
+        build_project,
+        'nitpicky = True\n'
+        'nitpick_ignore = [("vb:function", "Module1.missing")]\n')
+
+    assert '1 VB reference target(s) not found' in warnings
+    assert 'Module1.missing' not in warnings
+    assert 'Module2.missing' in warnings